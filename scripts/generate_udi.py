@@ -1,9 +1,13 @@
 import os
 import json
-import qrcode
+from datetime import datetime
+from reportlab import rl_config
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 
+# QR-Kodierung und -Zeichnung teilen sich alle Generatoren
+from udi_common import draw_qr_code, qr_page_code
+
 PRODUCT_DB = "docs/data/product_db.json"
 
 with open(PRODUCT_DB, "r", encoding="utf-8") as f:
@@ -16,14 +20,20 @@ count = int(os.environ["INPUT_COUNT"])
 
 if not date_yymmdd.isdigit() or len(date_yymmdd) != 6:
     raise ValueError("Ungültiges Datumsformat (YYMMDD erwartet)")
+# strptime prüft zusätzlich Monat und Tag gegen den Kalender. GS1 AI (11)
+# erlaubt Tag 00, wenn nur Jahr und Monat bekannt sind; dann wird nur der
+# Monat geprüft.
+day = date_yymmdd[4:] if date_yymmdd[4:] != "00" else "01"
+try:
+    datetime.strptime(date_yymmdd[:4] + day, "%y%m%d")
+except ValueError:
+    raise ValueError(f"Ungültiges Datum: {date_yymmdd}") from None
 
 if count <= 0:
     raise ValueError("Anzahl Etiketten muss > 0 sein")
 
-product = next(
-    (p for p in product_db["products"] if p["name"] == product_name),
-    None
-)
+products_by_name = {p["name"]: p for p in product_db["products"]}
+product = products_by_name.get(product_name)
 
 if not product:
     raise ValueError(f"Produkt '{product_name}' nicht gefunden")
@@ -33,33 +43,45 @@ gtin = product["gtin"]
 os.makedirs("output", exist_ok=True)
 
 pdf_path = f"output/UDI_Labels_{product_name.replace(' ', '_')}.pdf"
-c = canvas.Canvas(pdf_path, pagesize=A4)
+# Streams nur mit Flate komprimieren, ohne zusätzliche ASCII85-Kodierung
+rl_config.useA85 = 0
+c = canvas.Canvas(pdf_path, pagesize=A4, pageCompression=1)
 
 def make_udi(gtin, date, sn):
     return f"(01){gtin}(11){date}(21){sn}"
 
+# Nur die Seriennummer ändert sich, der AI-Präfix wird einmal gebildet
+udi_prefix = make_udi(gtin, date_yymmdd, "")
+
+# Kopfzeilen sind für alle Etiketten gleich, nur die Seriennummer ändert sich
+line_product = f"Produkt: {product_name}"
+line_gtin = f"GTIN: {gtin}"
+line_date = f"Herstelldatum (AI11): {date_yymmdd}"
+
+QR_SIZE = 150
+
 for i in range(count):
     sn = serial_start + i
-    udi = make_udi(gtin, date_yymmdd, sn)
-
-    qr_path = f"output/qr_{sn}.png"
-    qrcode.make(udi).save(qr_path)
+    udi = udi_prefix + str(sn)
 
-    c.drawString(20, 800, f"Produkt: {product_name}")
-    c.drawString(20, 780, f"GTIN: {gtin}")
-    c.drawString(20, 760, f"Herstelldatum (AI11): {date_yymmdd}")
+    c.drawString(20, 800, line_product)
+    c.drawString(20, 780, line_gtin)
+    c.drawString(20, 760, line_date)
     c.drawString(20, 740, f"Seriennummer: {sn}")
     c.drawString(20, 720, f"UDI: {udi}")
-    c.drawImage(qr_path, 350, 680, width=150, height=150)
+    draw_qr_code(c, qr_page_code(udi), 350, 680, QR_SIZE)
     c.showPage()
 
-    os.remove(qr_path)
-
 c.save()
 
-product["last_serial"] = serial_start + count - 1
+last_serial = serial_start + count - 1
 
-with open(PRODUCT_DB, "w", encoding="utf-8") as f:
-    json.dump(product_db, f, indent=2, ensure_ascii=False)
+if product.get("last_serial") != last_serial:
+    product["last_serial"] = last_serial
+    # Erst in eine temporäre Datei schreiben, dann atomar ersetzen
+    tmp_path = PRODUCT_DB + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(product_db, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, PRODUCT_DB)
 
 print(f"PDF erstellt: {pdf_path}")
@@ -45,19 +45,21 @@ VARIABLE ZONE REFERENCE (mm from bottom-left corner of page)
 
 import argparse
 import csv
+import functools
 import os
 from copy import deepcopy
+from datetime import datetime
 from io import BytesIO
 
-from PIL import Image
 from reportlab.lib.pagesizes import landscape, A4
 from reportlab.lib.units import mm
-from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 from pypdf import PdfReader, PdfWriter
-import qrcode
+from pypdf.generic import NameObject
 import json
 
+from udi_common import draw_qr_code, iter_qr_codes, write_csv_rows
+
 # ── Page constants ──────────────────────────────────────────────────────
 PAGE_WIDTH, PAGE_HEIGHT = landscape(A4)   # 841.89 × 595.28 pt
 mm_ = mm                                  # alias for readability
@@ -65,6 +67,11 @@ mm_ = mm                                  # alias for readability
 # ── Template path ───────────────────────────────────────────────────────
 TEMPLATE_PATH = "assets/label_template.pdf"
 
+# Page entries that merge_page combines or the writer owns.  Every other
+# entry of the template page (boxes, /Group, /Rotate, /UserUnit, ...) is
+# taken over unchanged, as if the overlay had been stamped onto it.
+_MERGED_PAGE_KEYS = ("/Type", "/Parent", "/Contents", "/Resources", "/Annots")
+
 
 # ===========================================================
 # OVERLAY COORDINATES
@@ -103,73 +110,74 @@ OVERLAY_FONT_SIZE = 17
 
 
 # ===========================================================
-# VALIDATION & UDI HELPERS  (unchanged from original)
+# VALIDATION & UDI HELPERS
 # ===========================================================
 
-def validate_manufacturing_date(mfg_date: str) -> str:
+@functools.lru_cache(maxsize=128)
+def parse_manufacturing_date(mfg_date: str) -> datetime:
+    """
+    Parse a YYMMDD date. strptime validates month and day ranges against
+    the calendar, so impossible dates like 250231 are rejected as well.
+    GS1 AI (11) allows day 00 when only year and month are known; such a
+    date parses as the first of that month.
+    """
     if len(mfg_date) != 6 or not mfg_date.isdigit():
         raise ValueError("Manufacturing date must be 6 digits (YYMMDD)")
-    month = int(mfg_date[2:4])
-    day   = int(mfg_date[4:6])
-    if not (1 <= month <= 12):
-        raise ValueError(f"Invalid month: {month}")
-    if not (1 <= day <= 31):
-        raise ValueError(f"Invalid day: {day}")
+    day = mfg_date[4:] if mfg_date[4:] != "00" else "01"
+    try:
+        return datetime.strptime(mfg_date[:4] + day, "%y%m%d")
+    except ValueError:
+        raise ValueError(f"Invalid manufacturing date: {mfg_date}") from None
+
+
+def validate_manufacturing_date(mfg_date: str) -> str:
+    parse_manufacturing_date(mfg_date)
     return mfg_date
 
 
-def generate_udi_string(gtin: str, mfg_date: str, serial: int) -> str:
-    return f"(01){gtin}(11){mfg_date}(21){serial}"
+def udi_prefix(gtin: str, mfg_date: str) -> str:
+    """The (01)/(11)/(21) part of the UDI, constant within a batch."""
+    return f"(01){gtin}(11){mfg_date}(21)"
 
 
-def generate_qr_code(data: str, width_pts: float) -> ImageReader:
-    """Generate a high-resolution QR code scaled to `width_pts` points."""
-    qr = qrcode.QRCode(
-        version=None,
-        error_correction=qrcode.constants.ERROR_CORRECT_M,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-    target_px = int(width_pts * 4)   # 4× for crisp print rendering
-    img = qr.make_image(fill_color="black", back_color="white").convert("L")
-    img = img.resize((target_px, target_px), Image.Resampling.LANCZOS)
-    buf = BytesIO()
-    img.save(buf, format="PNG")
-    buf.seek(0)
-    return ImageReader(buf)
+def generate_udi_strings(gtin: str, mfg_date: str,
+                         serial_start: int, count: int) -> list:
+    """UDI strings for a whole batch; the AI prefix is formatted only once."""
+    prefix = udi_prefix(gtin, mfg_date)
+    return [prefix + str(serial)
+            for serial in range(serial_start, serial_start + count)]
 
 
 # ===========================================================
 # OVERLAY LAYER BUILDER
 # ===========================================================
 
-def _build_overlay(gtin: str, mfg_date: str,
-                   serial: int, udi_payload: str) -> BytesIO:
+def _draw_overlay(c: canvas.Canvas, gtin: str, mfg_date: str,
+                  serial: int, qr: tuple) -> None:
     """
-    Create a single transparent PDF page containing ONLY the variable data.
-    Returns a BytesIO buffer holding a one-page PDF.
+    Draw ONLY the variable data for one label onto the current page of `c`.
+    The caller owns the canvas and starts a new page per label.
     """
-    buf = BytesIO()
-    c   = canvas.Canvas(buf, pagesize=landscape(A4))
-    c.setFont(OVERLAY_FONT, OVERLAY_FONT_SIZE)
-
     ox = OVERLAY
 
-    # Text fields
-    c.drawString(ox["gtin_value"][0], ox["gtin_value"][1], f"(01){gtin}")
-    c.drawString(ox["lot_value"][0],  ox["lot_value"][1],  f"(11){mfg_date}")
-    c.drawString(ox["sn_value"][0],   ox["sn_value"][1],   f"(21){serial}")
-
-    # QR code
+    # Text fields, all in one text object
+    text = c.beginText(*ox["gtin_value"])
+    text.setFont(OVERLAY_FONT, OVERLAY_FONT_SIZE)
+    text.textOut(f"(01){gtin}")
+    text.setTextOrigin(*ox["lot_value"])
+    text.textOut(f"(11){mfg_date}")
+    text.setTextOrigin(*ox["sn_value"])
+    text.textOut(f"(21){serial}")
+    c.drawText(text)
+
+    # QR code.  The path only fills the dark modules, so paint the box
+    # white first: light modules and quiet zone must not let template
+    # artwork show through, as the opaque raster QR never did.
     qr_x, qr_y, qr_w, qr_h = ox["qr_box"]
-    qr_img = generate_qr_code(udi_payload, qr_w)
-    c.drawImage(qr_img, qr_x, qr_y, width=qr_w, height=qr_h)
-
-    c.save()
-    buf.seek(0)
-    return buf
+    c.setFillGray(1)
+    c.rect(qr_x, qr_y, qr_w, qr_h, fill=1, stroke=0)
+    c.setFillGray(0)
+    draw_qr_code(c, qr, qr_x, qr_y, qr_w)
 
 
 # ===========================================================
@@ -190,21 +198,38 @@ def create_label_pdf(product: dict, mfg_date: str,
             "    to produce a calibration grid without needing a template."
         )
 
-    template_reader = PdfReader(TEMPLATE_PATH)
-    base_page       = template_reader.pages[0]
-    writer          = PdfWriter()
+    template_page = PdfReader(TEMPLATE_PATH).pages[0]
 
-    for i in range(count):
-        serial      = serial_start + i
-        udi_payload = generate_udi_string(product["gtin"], mfg_date, serial)
+    gtin     = product["gtin"]
+    payloads = generate_udi_strings(gtin, mfg_date, serial_start, count)
+    qr_codes = iter_qr_codes(payloads)
 
-        overlay_buf  = _build_overlay(product["gtin"], mfg_date,
-                                      serial, udi_payload)
-        overlay_page = PdfReader(overlay_buf).pages[0]
-
-        page = deepcopy(base_page)
-        page.merge_page(overlay_page)
-        writer.add_page(page)
+    # One overlay document for the whole batch, parsed once – instead of a
+    # Canvas + PdfReader round-trip per label.  It is only an intermediate
+    # that pypdf decodes again for merging, so its pages stay uncompressed.
+    overlay_buf = BytesIO()
+    c = canvas.Canvas(overlay_buf, pagesize=landscape(A4), pageCompression=0)
+    for i, qr in enumerate(qr_codes):
+        _draw_overlay(c, gtin, mfg_date, serial_start + i, qr)
+        c.showPage()
+    c.save()
+    overlay_buf.seek(0)
+
+    # Merge the template UNDER each fresh overlay page.  Stamping overlays
+    # onto deep copies of the template page shared its resources between
+    # labels (pages 2+ lost their QR image, large runs hit RecursionError).
+    # The rest of the template's page state, including the PDF/X-4
+    # transparency group, is copied over so the page renders as before.
+    template_state = {key: value for key, value in template_page.items()
+                      if key not in _MERGED_PAGE_KEYS}
+    writer = PdfWriter()
+    for page in PdfReader(overlay_buf).pages:
+        page.merge_page(template_page, over=False)
+        for key, value in template_state.items():
+            page[NameObject(key)] = value
+        # merge_page leaves the combined content stream uncompressed, which
+        # would repeat the raw template drawing on every page of the file.
+        writer.add_page(page).compress_content_streams()
 
     os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
     with open(output_file, "wb") as f:
@@ -215,13 +240,38 @@ def create_label_pdf(product: dict, mfg_date: str,
 
 
 # ===========================================================
-# CSV EXPORT  (unchanged from original)
+# CSV EXPORT
 # ===========================================================
 
+QR_CHART_URL    = "https://image-charts.com/chart?cht=qr&chs=250x250&chl="
+CSV_BUFFER_SIZE = 1 << 20   # one large write instead of one per few rows
+
+
 def create_csv_file(product: dict, mfg_date: str,
                     serial_start: int, count: int,
                     output_file: str) -> None:
-    with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
+    gtin       = product["gtin"]
+    gtin_label = f"(01){gtin}"
+    mfg_label  = f"(11){mfg_date}"
+    # The first ten columns are identical on every row
+    row_prefix = (
+        "(01)", gtin, product["name_de"],
+        product["grundeinheit"], product["sn_lot_type"],
+        product["kurztext"], product["warengruppe"],
+        "(11)", mfg_date, "(21)",
+    )
+
+    prefix     = udi_prefix(gtin, mfg_date)
+    url_prefix = QR_CHART_URL + prefix
+
+    def rows(serials):
+        for serial in serials:
+            udi = prefix + serial
+            yield row_prefix + (serial, udi, gtin_label, mfg_label,
+                                "(21)" + serial, udi, url_prefix + serial)
+
+    with open(output_file, "w", newline="", encoding="utf-8",
+              buffering=CSV_BUFFER_SIZE) as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow([
             "AI - GTIN", "Artikelnummer/GTIN", "Name", "Grund-einheit",
@@ -230,19 +280,8 @@ def create_csv_file(product: dict, mfg_date: str,
             "GTIN-Etikett", "Herstelldatum-Ettkett", "Seriennummer-Etikett",
             "QR", "QR-Code",
         ])
-        for i in range(count):
-            serial  = serial_start + i
-            udi     = generate_udi_string(product["gtin"], mfg_date, serial)
-            qr_url  = (f"https://image-charts.com/chart"
-                       f"?cht=qr&chs=250x250&chl={udi}")
-            writer.writerow([
-                "(01)", product["gtin"], product["name_de"],
-                product["grundeinheit"], product["sn_lot_type"],
-                product["kurztext"], product["warengruppe"],
-                "(11)", mfg_date, "(21)", serial, udi,
-                f"(01){product['gtin']}", f"(11){mfg_date}",
-                f"(21){serial}", udi, qr_url,
-            ])
+        write_csv_rows(csvfile, rows,
+                       map(str, range(serial_start, serial_start + count)))
     print(f"✓ CSV created: {output_file}")
 
 
@@ -6,69 +6,114 @@ Precision Grid System – Updated with requested adjustments
 
 import argparse
 import csv
+import functools
 import os
-from io import BytesIO
-from PIL import Image
+from datetime import datetime
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib.units import mm
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
-import qrcode
+from PIL import Image
 import json
+from reportlab import rl_config
+
+from udi_common import draw_qr_code, iter_qr_codes, write_csv_rows
 
 PAGE_WIDTH, PAGE_HEIGHT = landscape(A4)
 
+# Flate alone: ReportLab otherwise ASCII85-encodes every compressed page and
+# image stream as well, which makes them a quarter larger and costs a
+# pure-Python encoding pass per page
+rl_config.useA85 = 0
+
 
 # ==========================================================
 # VALIDATION
 # ==========================================================
 
-def validate_manufacturing_date(mfg_date):
+@functools.lru_cache(maxsize=128)
+def parse_manufacturing_date(mfg_date):
+    """Parse a YYMMDD date; strptime also rejects impossible days like 250231."""
     if len(mfg_date) != 6 or not mfg_date.isdigit():
         raise ValueError("Manufacturing date must be 6 digits (YYMMDD)")
-    month = int(mfg_date[2:4])
-    day = int(mfg_date[4:6])
-    if not (1 <= month <= 12):
-        raise ValueError("Invalid month")
-    if not (1 <= day <= 31):
-        raise ValueError("Invalid day")
+    # GS1 AI (11) allows day 00 when only year and month are known
+    day = mfg_date[4:] if mfg_date[4:] != "00" else "01"
+    try:
+        return datetime.strptime(mfg_date[:4] + day, "%y%m%d")
+    except ValueError:
+        raise ValueError(f"Invalid manufacturing date: {mfg_date}") from None
+
+
+def validate_manufacturing_date(mfg_date):
+    parse_manufacturing_date(mfg_date)
     return mfg_date
 
 
-def generate_udi_string(gtin, mfg_date, serial):
-    return f"(01){gtin}(11){mfg_date}(21){serial}"
+def udi_prefix(gtin, mfg_date):
+    return f"(01){gtin}(11){mfg_date}(21)"
 
 
-def generate_qr_code(data, target_px):
-    qr = qrcode.QRCode(
-        version=None,
-        error_correction=qrcode.constants.ERROR_CORRECT_M,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white").convert("L")
-    img = img.resize((target_px, target_px), Image.Resampling.LANCZOS)
-    buf = BytesIO()
-    img.save(buf, format="PNG")
-    buf.seek(0)
-    return ImageReader(buf)
+def generate_udi_strings(gtin, mfg_date, serial_start, count):
+    # Only the serial differs within a batch; format the AI prefix once
+    prefix = udi_prefix(gtin, mfg_date)
+    return [prefix + str(serial) for serial in range(serial_start, serial_start + count)]
 
 
+@functools.lru_cache(maxsize=None)
+def _files_in(directory):
+    # One directory listing instead of an exists() probe per asset
+    try:
+        with os.scandir(directory) as entries:
+            return frozenset(entry.name for entry in entries if entry.is_file())
+    except FileNotFoundError:
+        return frozenset()
+
+
+@functools.lru_cache(maxsize=None)
 def load_image_safe(path):
-    if os.path.exists(path):
-        return ImageReader(path)
+    # One decoded image per asset; load() reads the pixels up front so no
+    # file handle stays open for the lifetime of the image
+    directory, name = os.path.split(path)
+    if name in _files_in(directory or "."):
+        with Image.open(path) as image:
+            image.load()
+            return image
     return None
 
 
+# Print resolution for the label assets. Several symbols ship at around
+# 2000 px for a box of 20-30 mm (over 1800 dpi); ReportLab decodes, hashes
+# and compresses every pixel, which was nearly all of the time spent on a
+# small batch and most of the file size.
+ASSET_DPI = 600
+
+# reduce() averages pixel values, which means nothing for palette indices
+# and is not implemented for bilevel or 16-bit images. Palette and bilevel
+# assets are converted first; 16-bit ones are embedded at full size.
+REDUCE_CONVERSIONS = {"P": "RGBA", "PA": "RGBA", "1": "L"}
+
+
+def asset_reader(image, width, height):
+    # Downsample an asset once, before embedding, by the largest whole
+    # factor that still leaves ASSET_DPI for the width x height (pt) box it
+    # is drawn into. reduce() averages pixel blocks, keeps the aspect ratio
+    # and is several times faster than a resampling resize().
+    factor = int(min(image.width * 72 / (width * ASSET_DPI),
+                     image.height * 72 / (height * ASSET_DPI)))
+    if factor > 1 and not image.mode.startswith("I;16"):
+        if image.mode in REDUCE_CONVERSIONS:
+            image = image.convert(REDUCE_CONVERSIONS[image.mode])
+        image = image.reduce(factor)
+    return ImageReader(image)
+
+
 # ==========================================================
 # MASTER LAYOUT
 # ==========================================================
 
 def create_label_pdf(product, mfg_date, serial_start, count, output_file):
 
-    c = canvas.Canvas(output_file, pagesize=landscape(A4))
+    c = canvas.Canvas(output_file, pagesize=landscape(A4), pageCompression=1)
 
     # --- MASTER GRID ---
     MARGIN_LEFT = 18 * mm
@@ -96,240 +141,269 @@ def create_label_pdf(product, mfg_date, serial_start, count, output_file):
     udi_symbol = load_image_safe("assets/image14.png")
     spec_symbols = load_image_safe("assets/Screenshot 2026-01-28 100951.png")
 
-    for i in range(count):
+    qr_size = 85 * mm * 1.25 * 0.9  # 95.625mm (125% then reduced by 10%)
+
+    payloads = generate_udi_strings(product["gtin"], mfg_date, serial_start, count)
+
+    # Label text that is the same on every page; only the serial changes
+    name_de = product["name_de"]
+    name_en = product["name_en"]
+    name_fr = product["name_fr"]
+    name_it = product["name_it"]
+    description_de = product["description_de"][:100]
+    description_en = product["description_en"][:100]
+    description_fr = product["description_fr"][:100]
+    description_it = product["description_it"][:100]
+    manufacturer = product["manufacturer"]
+    manufacturer_lines = (manufacturer["name"], manufacturer["address_line1"],
+                          manufacturer["address_line2"])
+    distributor = product["distributor"]
+    distributor_lines = (distributor["name"], distributor["address_line1"],
+                         distributor["address_line2"])
+    gtin_label = f"(01){product['gtin']}"
+    mfg_label = f"(11){mfg_date}"
+
+    # Everything except the serial number and the QR code is identical on
+    # every label, so it is drawn once into a form XObject that each page
+    # references.
+    c.beginForm("label_chrome")
+
+    # ======================================================
+    # HEADER
+    # ======================================================
+
+    # Logo moved LEFT 30pt total (previous 25pt + 5pt)
+    if logo:
+        logo_w = 115 * mm
+        logo_h = 32 * mm
+        c.drawImage(
+            asset_reader(logo, logo_w, logo_h),
+            V1 - 3 * mm - 30,  # 30pt total left movement
+            HEADER_TOP - logo_h,
+            width=logo_w,
+            height=logo_h,
+            preserveAspectRatio=True,
+            mask="auto"
+        )
+
+    symbol_size = 20 * mm
+    symbol_y = HEADER_TOP - symbol_size
+
+    # Increase spec-to-MD gap by 3mm
+    if spec_symbols:
+        spec_w = 85 * mm
+        spec_h = 20 * mm
+        c.drawImage(
+            asset_reader(spec_symbols, spec_w, spec_h),
+            V6 - spec_w - symbol_size * 2 - 13 * mm,
+            symbol_y,
+            width=spec_w,
+            height=spec_h,
+            preserveAspectRatio=True,
+            mask="auto"
+        )
+
+    if md_symbol:
+        md_size = symbol_size * 1.25 * 1.25 * 0.95  # 29.6875mm (unchanged)
+        c.drawImage(
+            asset_reader(md_symbol, md_size, md_size),
+            V6 - symbol_size * 2 - 5 * mm - 30,  # -20pt - 10pt = -30pt left total
+            symbol_y - 5 - 3 - 7,  # -8pt - 7pt = -15pt down total
+            width=md_size,
+            height=md_size,
+            preserveAspectRatio=True,
+            mask="auto"
+        )
+
+    if ce_mark:
+        # CE lowered 1mm
+        c.drawImage(
+            asset_reader(ce_mark, symbol_size, symbol_size),
+            V6 - symbol_size,
+            symbol_y - 1 * mm,
+            width=symbol_size,
+            height=symbol_size,
+            preserveAspectRatio=True,
+            mask="auto"
+        )
+
+    # ======================================================
+    # LEFT COLUMN
+    # ======================================================
+
+    y = HEADER_BOTTOM - 3.5 * mm  # Title moved UP 1.5mm
+
+    TITLE_SPACING = 8.2 * mm
+    BODY_SPACING = 6.2 * mm
+
+    # All left column text goes into one text object; each block starts
+    # at its own origin and steps down by the font leading
+    left_text = c.beginText(V1, y)
+    left_text.setFont("Helvetica-Bold", 23, TITLE_SPACING)
+    for line in (name_de, name_en, name_fr, name_it):
+        left_text.textLine(line)
+    y -= 3 * TITLE_SPACING
+
+    # Reduce title/description gap by 2mm
+    y -= 12 * mm
+
+    left_text.setTextOrigin(V1, y)
+    left_text.setFont("Helvetica", 16, BODY_SPACING)
+    for line in (description_de, description_en, description_fr, description_it):
+        left_text.textLine(line)
+    y -= 3 * BODY_SPACING
+
+    # Manufacturer block moved UP 2mm
+    y -= 12 * mm
+
+    # UPDATED: Manufacturer icon size increased by 15% (from 18mm to 20.7mm)
+    icon_size = 18 * mm * 1.15  # 20.7mm
+    manufacturer_x_offset = 68  # 68pt total right movement (63pt + 3pt + 2pt)
+    text_x = V1 + icon_size + 8 * mm + manufacturer_x_offset + 5  # moved 5pt right
+
+    if manufacturer_symbol:
+        c.drawImage(
+            asset_reader(manufacturer_symbol, icon_size, icon_size),
+            V1 + manufacturer_x_offset,  # 68pt right
+            y - icon_size + 4 + 4,  # moved UP 4pt total (3pt + 1pt)
+            width=icon_size,
+            height=icon_size,
+            preserveAspectRatio=True,
+            mask="auto"
+        )
+
+    # UPDATED: Manufacturer text font size increased by 5pts (from 15pt to 20pt)
+    mfr_text_y_offset = -10  # 10pt down total
+    left_text.setTextOrigin(text_x, y + mfr_text_y_offset)
+    left_text.setFont("Helvetica", 20, BODY_SPACING)
+    for line in manufacturer_lines:
+        left_text.textLine(line)
+    y -= 2 * BODY_SPACING
+
+    # EC REP block moved UP 2mm
+    y -= 12 * mm
+
+    # UPDATED: EC REP icon size increased by 15% (from 41.015625mm to 47.168mm)
+    ec_icon_size = 28 * mm * 1.25 * 1.25 * 1.25 * 0.75 * 1.15  # 47.168mm
+    ec_y_offset = 40  # 40pt total up movement (38pt + 2pt)
+
+    if ec_rep_symbol:
+        c.drawImage(
+            asset_reader(ec_rep_symbol, ec_icon_size, ec_icon_size),
+            V1,
+            y - ec_icon_size + 4 + ec_y_offset,  # 40pt up
+            width=ec_icon_size,
+            height=ec_icon_size,
+            preserveAspectRatio=True,
+            mask="auto"
+        )
+
+    ec_text_x = V1 + ec_icon_size + 8 * mm
+    ec_text_y_offset = -13  # 3pt down + 7pt down + 3pt down = 13pt down total
+
+    # EC REP text shares the manufacturer's 20pt font (increased by 5pts from 15pt)
+    left_text.setTextOrigin(ec_text_x, y + ec_text_y_offset)
+    for line in distributor_lines:
+        left_text.textLine(line)
+    c.drawText(left_text)
+
+    # ======================================================
+    # RIGHT COLUMN
+    # ======================================================
+
+    right_y = HEADER_BOTTOM - 8 * mm
+
+    # GTIN/LOT/SN block
+    text_block_x_offset = 75  # 75pt total for numeric values (moved 3pt left from 78pt)
+    label_icon_x_offset = 69  # 69pt total for icons and labels (moved 6pt left total from 75pt: 72pt - 3pt)
+
+    right_text = c.beginText(V3 + label_icon_x_offset, right_y)
+    right_text.setFont("Helvetica-Bold", 28)  # 28pt (reduced by 2pt from 30pt)
+    right_text.textOut("GTIN")
+
+    right_text.setFont("Helvetica", 17)
+    right_text.setTextOrigin(V4 + text_block_x_offset, right_y + 5)  # moved UP 5pt
+    right_text.textOut(gtin_label)
+
+    # UPDATED: Vertical spacing decreased by 5pts (from 12pt to 7pt)
+    right_y -= 14 * mm + 7  # Original 14mm + 7pt increase between GTIN and LOT
+
+    # LOT icon - UP 5pt total, RIGHT 75pt total, SCALED 150%
+    lot_icon_y_offset = 5  # 5pt total up movement (8pt - 3pt down)
+    lot_icon_size = 16 * mm * 1.5  # 24mm (150% scale: 16mm × 1.5)
+
+    if manufacturer_symbol_empty:
+        c.drawImage(
+            asset_reader(manufacturer_symbol_empty, lot_icon_size, lot_icon_size),
+            V3 + label_icon_x_offset,  # 75pt right
+            right_y - 9.5 * mm + lot_icon_y_offset,  # 5pt up
+            width=lot_icon_size,
+            height=lot_icon_size,
+            preserveAspectRatio=True,
+            mask="auto"
+        )
+
+    right_text.setTextOrigin(V4 + text_block_x_offset, right_y - 5)  # -5pt between GTIN and LOT numbers
+    right_text.textOut(mfg_label)
+
+    # UPDATED: Vertical spacing decreased by 5pts (from 12pt to 7pt)
+    right_y -= 14 * mm + 7  # Original 14mm + 7pt increase between LOT and SN
+
+    # SN icon - RIGHT 75pt total, SCALED 150%
+    sn_icon_size = 16 * mm * 1.5  # 24mm (150% scale: 16mm × 1.5)
+    
+    if sn_symbol:
+        c.drawImage(
+            asset_reader(sn_symbol, sn_icon_size, sn_icon_size),
+            V3 + label_icon_x_offset,  # 75pt right
+            right_y - 7 * mm - 12,  # moved DOWN 12pt total (7pt + 5pt)
+            width=sn_icon_size,
+            height=sn_icon_size,
+            preserveAspectRatio=True,
+            mask="auto"
+        )
+
+    c.drawText(right_text)
+
+    # The SN value is drawn per page
+    sn_x = V4 + text_block_x_offset
+    sn_y = right_y - 5  # -5pt between LOT and SN numbers
+
+    # ======================================================
+    # QR + UDI
+    # ======================================================
+
+    qr_x = V6 - qr_size - 3 + 10 + 5 + 2  # moved 3pt left, then 10pt right, then 5pt right, then 2pt right (net 14pt right)
+    qr_y = MARGIN_BOTTOM + 3 * mm - 10 - 15 - 10 - 7  # QR moved UP 3mm, then DOWN 10pt, then DOWN 15pt, then DOWN 10pt, then DOWN 7pt
+
+    if udi_symbol:
+        udi_size = 26 * mm
+        c.drawImage(
+            asset_reader(udi_symbol, udi_size, udi_size),
+            qr_x - udi_size - 11 * mm + 32,  # moved RIGHT 32pt total (5pt + 10pt + 5pt + 7pt + 5pt)
+            qr_y + (qr_size - udi_size) / 2 + 2 * mm,  # moved UP 2mm (relative to QR position)
+            width=udi_size,
+            height=udi_size,
+            preserveAspectRatio=True,
+            mask="auto"
+        )
+
+    c.endForm()
+
+    for i, qr in enumerate(iter_qr_codes(payloads)):
 
         if i > 0:
             c.showPage()
 
-        serial = serial_start + i
-        udi_payload = generate_udi_string(product["gtin"], mfg_date, serial)
-
-        # ======================================================
-        # HEADER
-        # ======================================================
-
-        # Logo moved LEFT 30pt total (previous 25pt + 5pt)
-        if logo:
-            logo_w = 115 * mm
-            logo_h = 32 * mm
-            c.drawImage(
-                logo,
-                V1 - 3 * mm - 30,  # 30pt total left movement
-                HEADER_TOP - logo_h,
-                width=logo_w,
-                height=logo_h,
-                preserveAspectRatio=True,
-                mask="auto"
-            )
-
-        symbol_size = 20 * mm
-        symbol_y = HEADER_TOP - symbol_size
-
-        # Increase spec-to-MD gap by 3mm
-        if spec_symbols:
-            spec_w = 85 * mm
-            spec_h = 20 * mm
-            c.drawImage(
-                spec_symbols,
-                V6 - spec_w - symbol_size * 2 - 13 * mm,
-                symbol_y,
-                width=spec_w,
-                height=spec_h,
-                preserveAspectRatio=True,
-                mask="auto"
-            )
-
-        if md_symbol:
-            md_size = symbol_size * 1.25 * 1.25 * 0.95  # 29.6875mm (unchanged)
-            c.drawImage(
-                md_symbol,
-                V6 - symbol_size * 2 - 5 * mm - 30,  # -20pt - 10pt = -30pt left total
-                symbol_y - 5 - 3 - 7,  # -8pt - 7pt = -15pt down total
-                width=md_size,
-                height=md_size,
-                preserveAspectRatio=True,
-                mask="auto"
-            )
-
-        if ce_mark:
-            # CE lowered 1mm
-            c.drawImage(
-                ce_mark,
-                V6 - symbol_size,
-                symbol_y - 1 * mm,
-                width=symbol_size,
-                height=symbol_size,
-                preserveAspectRatio=True,
-                mask="auto"
-            )
+        c.doForm("label_chrome")
 
-        # ======================================================
-        # LEFT COLUMN
-        # ======================================================
-
-        y = HEADER_BOTTOM - 3.5 * mm  # Title moved UP 1.5mm
-
-        TITLE_SPACING = 8.2 * mm
-        BODY_SPACING = 6.2 * mm
-
-        c.setFont("Helvetica-Bold", 23)
-        c.drawString(V1, y, product["name_de"])
-        y -= TITLE_SPACING
-        c.drawString(V1, y, product["name_en"])
-        y -= TITLE_SPACING
-        c.drawString(V1, y, product["name_fr"])
-        y -= TITLE_SPACING
-        c.drawString(V1, y, product["name_it"])
-
-        # Reduce title/description gap by 2mm
-        y -= 12 * mm
-
-        c.setFont("Helvetica", 16)
-        c.drawString(V1, y, product["description_de"][:100])
-        y -= BODY_SPACING
-        c.drawString(V1, y, product["description_en"][:100])
-        y -= BODY_SPACING
-        c.drawString(V1, y, product["description_fr"][:100])
-        y -= BODY_SPACING
-        c.drawString(V1, y, product["description_it"][:100])
-
-        # Manufacturer block moved UP 2mm
-        y -= 12 * mm
-
-        # UPDATED: Manufacturer icon size increased by 15% (from 18mm to 20.7mm)
-        icon_size = 18 * mm * 1.15  # 20.7mm
-        manufacturer_x_offset = 68  # 68pt total right movement (63pt + 3pt + 2pt)
-        text_x = V1 + icon_size + 8 * mm + manufacturer_x_offset + 5  # moved 5pt right
-
-        if manufacturer_symbol:
-            c.drawImage(
-                manufacturer_symbol,
-                V1 + manufacturer_x_offset,  # 68pt right
-                y - icon_size + 4 + 4,  # moved UP 4pt total (3pt + 1pt)
-                width=icon_size,
-                height=icon_size,
-                preserveAspectRatio=True,
-                mask="auto"
-            )
-
-        # UPDATED: Manufacturer text font size increased by 5pts (from 15pt to 20pt)
-        c.setFont("Helvetica", 20)
-        mfr_text_y_offset = -10  # 10pt down total
-        c.drawString(text_x, y + mfr_text_y_offset, product["manufacturer"]["name"])
-        y -= BODY_SPACING
-        c.drawString(text_x, y + mfr_text_y_offset, product["manufacturer"]["address_line1"])
-        y -= BODY_SPACING
-        c.drawString(text_x, y + mfr_text_y_offset, product["manufacturer"]["address_line2"])
-
-        # EC REP block moved UP 2mm
-        y -= 12 * mm
-
-        # UPDATED: EC REP icon size increased by 15% (from 41.015625mm to 47.168mm)
-        ec_icon_size = 28 * mm * 1.25 * 1.25 * 1.25 * 0.75 * 1.15  # 47.168mm
-        ec_y_offset = 40  # 40pt total up movement (38pt + 2pt)
-
-        if ec_rep_symbol:
-            c.drawImage(
-                ec_rep_symbol,
-                V1,
-                y - ec_icon_size + 4 + ec_y_offset,  # 40pt up
-                width=ec_icon_size,
-                height=ec_icon_size,
-                preserveAspectRatio=True,
-                mask="auto"
-            )
-
-        ec_text_x = V1 + ec_icon_size + 8 * mm
-        ec_text_y_offset = -13  # 3pt down + 7pt down + 3pt down = 13pt down total
-
-        # UPDATED: EC REP text font size increased by 5pts (from 15pt to 20pt)
-        c.setFont("Helvetica", 20)
-        c.drawString(ec_text_x, y + ec_text_y_offset, product["distributor"]["name"])
-        y -= BODY_SPACING
-        c.drawString(ec_text_x, y + ec_text_y_offset, product["distributor"]["address_line1"])
-        y -= BODY_SPACING
-        c.drawString(ec_text_x, y + ec_text_y_offset, product["distributor"]["address_line2"])
-
-        # ======================================================
-        # RIGHT COLUMN
-        # ======================================================
-
-        right_y = HEADER_BOTTOM - 8 * mm
-
-        # GTIN/LOT/SN block
-        text_block_x_offset = 75  # 75pt total for numeric values (moved 3pt left from 78pt)
-        label_icon_x_offset = 69  # 69pt total for icons and labels (moved 6pt left total from 75pt: 72pt - 3pt)
-
-        c.setFont("Helvetica-Bold", 28)  # 28pt (reduced by 2pt from 30pt)
-        c.drawString(V3 + label_icon_x_offset, right_y, "GTIN")
-
-        c.setFont("Helvetica", 17)
-        c.drawString(V4 + text_block_x_offset, right_y + 5, f"(01){product['gtin']}")  # moved UP 5pt
-
-        # UPDATED: Vertical spacing decreased by 5pts (from 12pt to 7pt)
-        right_y -= 14 * mm + 7  # Original 14mm + 7pt increase between GTIN and LOT
-
-        # LOT icon - UP 5pt total, RIGHT 75pt total, SCALED 150%
-        lot_icon_y_offset = 5  # 5pt total up movement (8pt - 3pt down)
-        lot_icon_size = 16 * mm * 1.5  # 24mm (150% scale: 16mm × 1.5)
-
-        if manufacturer_symbol_empty:
-            c.drawImage(
-                manufacturer_symbol_empty,
-                V3 + label_icon_x_offset,  # 75pt right
-                right_y - 9.5 * mm + lot_icon_y_offset,  # 5pt up
-                width=lot_icon_size,
-                height=lot_icon_size,
-                preserveAspectRatio=True,
-                mask="auto"
-            )
-
-        c.drawString(V4 + text_block_x_offset, right_y - 5, f"(11){mfg_date}")  # -5pt between GTIN and LOT numbers
-
-        # UPDATED: Vertical spacing decreased by 5pts (from 12pt to 7pt)
-        right_y -= 14 * mm + 7  # Original 14mm + 7pt increase between LOT and SN
-
-        # SN icon - RIGHT 75pt total, SCALED 150%
-        sn_icon_size = 16 * mm * 1.5  # 24mm (150% scale: 16mm × 1.5)
-        
-        if sn_symbol:
-            c.drawImage(
-                sn_symbol,
-                V3 + label_icon_x_offset,  # 75pt right
-                right_y - 7 * mm - 12,  # moved DOWN 12pt total (7pt + 5pt)
-                width=sn_icon_size,
-                height=sn_icon_size,
-                preserveAspectRatio=True,
-                mask="auto"
-            )
-
-        c.drawString(V4 + text_block_x_offset, right_y - 5, f"(21){serial}")  # -5pt between LOT and SN numbers
-
-        # ======================================================
-        # QR + UDI
-        # ======================================================
-
-        qr_size = 85 * mm * 1.25 * 0.9  # 95.625mm (125% then reduced by 10%)
-        qr_size_px = int(qr_size * 4)
-
-        qr_img = generate_qr_code(udi_payload, qr_size_px)
-
-        qr_x = V6 - qr_size - 3 + 10 + 5 + 2  # moved 3pt left, then 10pt right, then 5pt right, then 2pt right (net 14pt right)
-        qr_y = MARGIN_BOTTOM + 3 * mm - 10 - 15 - 10 - 7  # QR moved UP 3mm, then DOWN 10pt, then DOWN 15pt, then DOWN 10pt, then DOWN 7pt
-
-        c.drawImage(qr_img, qr_x, qr_y, width=qr_size, height=qr_size)
+        serial = serial_start + i
+        serial_text = c.beginText(sn_x, sn_y)
+        serial_text.setFont("Helvetica", 17)
+        serial_text.textOut(f"(21){serial}")
+        c.drawText(serial_text)
 
-        if udi_symbol:
-            udi_size = 26 * mm
-            c.drawImage(
-                udi_symbol,
-                qr_x - udi_size - 11 * mm + 32,  # moved RIGHT 32pt total (5pt + 10pt + 5pt + 7pt + 5pt)
-                qr_y + (qr_size - udi_size) / 2 + 2 * mm,  # moved UP 2mm (relative to QR position)
-                width=udi_size,
-                height=udi_size,
-                preserveAspectRatio=True,
-                mask="auto"
-            )
+        draw_qr_code(c, qr, qr_x, qr_y, qr_size)
 
     c.save()
     print(f"✓ PDF created: {output_file}")
@@ -339,8 +413,39 @@ def create_label_pdf(product, mfg_date, serial_start, count, output_file):
 # CSV
 # ==========================================================
 
+QR_CHART_URL = "https://image-charts.com/chart?cht=qr&chs=250x250&chl="
+CSV_BUFFER_SIZE = 1 << 20  # write the CSV in large blocks
+
+
 def create_csv_file(product, mfg_date, serial_start, count, output_file):
-    with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
+    gtin = product["gtin"]
+    gtin_label = f"(01){gtin}"
+    mfg_label = f"(11){mfg_date}"
+
+    # The first ten columns are identical on every row
+    row_prefix = (
+        "(01)", gtin, product["name_de"],
+        product["grundeinheit"], product["sn_lot_type"],
+        product["kurztext"], product["warengruppe"],
+        "(11)", mfg_date, "(21)",
+    )
+
+    prefix = udi_prefix(gtin, mfg_date)
+    url_prefix = QR_CHART_URL + prefix
+
+    def rows(serials):
+        for serial in serials:
+            udi = prefix + serial
+            yield row_prefix + (
+                serial, udi,
+                gtin_label,
+                mfg_label,
+                "(21)" + serial,
+                udi,
+                url_prefix + serial
+            )
+
+    with open(output_file, "w", newline="", encoding="utf-8", buffering=CSV_BUFFER_SIZE) as csvfile:
         writer = csv.writer(csvfile)
 
         writer.writerow([
@@ -350,22 +455,7 @@ def create_csv_file(product, mfg_date, serial_start, count, output_file):
             "Herstelldatum-Ettkett", "Seriennummer-Etikett", "QR", "QR-Code"
         ])
 
-        for i in range(count):
-            serial = serial_start + i
-            udi = generate_udi_string(product["gtin"], mfg_date, serial)
-            qr_url = f"https://image-charts.com/chart?cht=qr&chs=250x250&chl={udi}"
-
-            writer.writerow([
-                "(01)", product["gtin"], product["name_de"],
-                product["grundeinheit"], product["sn_lot_type"],
-                product["kurztext"], product["warengruppe"],
-                "(11)", mfg_date, "(21)", serial, udi,
-                f"(01){product['gtin']}",
-                f"(11){mfg_date}",
-                f"(21){serial}",
-                udi,
-                qr_url
-            ])
+        write_csv_rows(csvfile, rows, map(str, range(serial_start, serial_start + count)))
 
     print(f"✓ CSV created: {output_file}")
 
@@ -0,0 +1,157 @@
+"""
+QR encoding and drawing, and CSV row writing, shared by the UDI label
+generators.
+
+generate_udi_labels.py (template overlay),
+generate_udi_labels_reportlab.py (standalone layout) and generate_udi.py
+(simple workflow labels) import from here; the scripts directory is on
+sys.path when any of them is run as a script.
+"""
+
+import csv
+import functools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+from itertools import groupby
+
+import qrcode
+
+# Fixed mask pattern: any mask is valid QR, and skipping qrcode's 8-way
+# best_mask_pattern() search removes most of the per-code encode time.
+QR_MASK_PATTERN = 0
+
+# Level M (~15% recovery) as GS1 recommends for QR. A full UDI such as
+# (01)7649995659102(11)251104(21)8110007550 needs version 3 at L as well
+# as at M, so dropping to L would only weaken the code, not shrink it.
+QR_ERROR_CORRECTION = qrcode.constants.ERROR_CORRECT_M
+
+# Below this many labels, worker start-up costs more than it saves.
+QR_POOL_MIN_COUNT = 32
+
+# One encoder per process; only the payload changes between labels.
+_QR = qrcode.QRCode(
+    version=None,
+    error_correction=QR_ERROR_CORRECTION,
+    border=4,
+    mask_pattern=QR_MASK_PATTERN,
+)
+_QR_VERSIONS = {}   # payload length -> fitted QR version
+
+
+def _qr_matrix(data: str) -> list:
+    """Encode `data` and return the module matrix including the quiet zone."""
+    _QR.clear()
+    # UDIs of equal length (same prefix, all-digit serial) need the same
+    # version. Fit only the first payload of each length; after that the
+    # version is pinned and make() skips the fitting pass entirely.
+    version = _QR_VERSIONS.get(len(data))
+    _QR.version = version
+    _QR.add_data(data)
+    _QR.make(fit=version is None)
+    _QR_VERSIONS[len(data)] = _QR.version
+    return _QR.get_matrix()
+
+
+def qr_module_runs(matrix: list) -> list:
+    """
+    Dark modules of a QR matrix as (row, col, width, height) blocks:
+    consecutive dark modules in a row, merged with identical runs directly
+    below.  Far fewer rectangles than one per module.
+    """
+    runs  = []
+    above = {}   # (col, width) -> index of the run ending on the previous row
+    for row, modules in enumerate(matrix):
+        current = {}
+        col     = 0
+        for dark, group in groupby(modules):
+            width = sum(1 for _ in group)
+            if dark:
+                key   = (col, width)
+                index = above.get(key)
+                if index is None:
+                    index = len(runs)
+                    runs.append((row, col, width, 1))
+                else:
+                    top, _, _, height = runs[index]
+                    runs[index] = (top, col, width, height + 1)
+                current[key] = index
+            col += width
+        above = current
+    return runs
+
+
+@functools.lru_cache(maxsize=4096)
+def qr_page_code(data: str) -> tuple:
+    """
+    Encode `data` and return (modules, path): the side length including
+    the quiet zone, and PDF fill operators for the dark modules in module
+    units, rows counted down from the top.  Everything is formatted here,
+    so a worker process hands back plain strings that pickle cheaply.
+    """
+    matrix = _qr_matrix(data)
+    rects  = " ".join(f"{col} {row} {width} {height} re"
+                      for row, col, width, height in qr_module_runs(matrix))
+    return len(matrix), rects + " f"
+
+
+def iter_qr_codes(payloads: list):
+    """
+    Yield qr_page_code() for each payload, in order.
+    QR encoding is pure-Python CPU work, so large batches are spread over
+    a process pool while the caller keeps building pages.
+    """
+    workers = 1
+    if len(payloads) >= QR_POOL_MIN_COUNT:
+        workers   = os.cpu_count() or 1
+        chunksize = max(1, len(payloads) // (4 * workers))
+        # No more workers than there are chunks to hand out.
+        workers   = min(workers, math.ceil(len(payloads) / chunksize))
+    if workers == 1:
+        for data in payloads:
+            yield qr_page_code(data)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(qr_page_code, payloads, chunksize=chunksize)
+
+
+def draw_qr_code(c, qr: tuple, x: float, y: float, size: float) -> None:
+    """
+    Draw a QR code from qr_page_code() on canvas `c` as a vector path
+    filling the square at (x, y).  Sharp at any print resolution, no
+    raster image.
+    """
+    modules, path = qr
+    module = size / modules
+    c.saveState()
+    # module units -> page: scale by the module size, rows run downwards
+    c.transform(module, 0, 0, -module, x, y + size)
+    c.addLiteral(path)
+    c.restoreState()
+
+
+# Stands in for the serial when the CSV template row is formatted.
+CSV_SERIAL_MARKER = "\x1f"
+
+
+def write_csv_rows(csvfile, rows, serials) -> None:
+    """
+    Write rows(serials) to `csvfile` exactly as csv.writer would.
+
+    `rows` turns an iterable of serial strings into row tuples in which
+    only the serial differs.  A string of digits is never quoted or
+    escaped, so one row is formatted through the csv module with a marker
+    wherever the serial goes, and every line is built by joining the
+    pieces around the serial.  Falls back to csv.writer if the marker
+    turns up in the rest of the row.
+    """
+    if any(CSV_SERIAL_MARKER in str(field) for field in next(iter(rows([""])))):
+        csv.writer(csvfile).writerows(rows(serials))
+        return
+
+    template = StringIO()
+    csv.writer(template).writerows(rows([CSV_SERIAL_MARKER]))
+    pieces = template.getvalue().split(CSV_SERIAL_MARKER)
+    csvfile.writelines(serial.join(pieces) for serial in serials)